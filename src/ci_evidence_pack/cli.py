@@ -1,70 +1,58 @@
 import os
 import sys
-import typer
 from pathlib import Path
 from typing import List, Optional
-try:
-    from importlib.metadata import version
-except ImportError:
-    from importlib_metadata import version
 
 from .pack import create_bundle
 from .verify import verify_bundle
 from .util import (
-    setup_logging, logging, init_console, 
+    setup_logging, logging, init_console,
     print_json, print_success, print_error
 )
 from . import util
 
-app = typer.Typer(help="CI Evidence Pack Generator", add_completion=False)
+# The Typer app (see typer_app.py) is only imported when needed: for --help,
+# --version and anything the fast argparse path below does not recognise.
+# `from ci_evidence_pack.cli import app` keeps working via __getattr__.
+def __getattr__(name):
+    if name == "app":
+        from .typer_app import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def version_callback(value: bool):
-    if value:
-        try:
-            v = version("ci-evidence-pack")
-        except:
-            v = "unknown"
-        typer.echo(f"ci-evidence-pack v{v} - Made by OrygnsCode")
-        raise typer.Exit()
-
-@app.callback()
-def main_callback(
-    version: Optional[bool] = typer.Option(
-        None, "--version", callback=version_callback, is_eager=True, help="Show version."
-    )
-):
-    pass
-
-@app.command()
-
-def pack(
-    repo: Path = typer.Option(Path("."), help="Path to repo root"),
-    out: Path = typer.Option(Path("dist"), help="Output directory"),
-    bundle_name: Optional[str] = typer.Option(None, help="Override bundle filename"),
-    include: List[str] = typer.Option([], help="Files/dirs to include (relative to repo)"),
-    sbom: str = typer.Option("auto", help="SBOM tool: cyclonedx, syft, none, auto"),
-    collect_pip_freeze: bool = typer.Option(True, help="Collect pip freeze if python detected"),
-    collect_git: bool = typer.Option(True, help="Collect git metadata"),
-    
-    # Deprecated aliases
-    collection_git: Optional[str] = typer.Option(None, "--collection-git", hidden=True, help="Deprecated alias for --collect-git"),
-    
-    # Signing
-    cosign_sign: bool = typer.Option(False, help="Sign with Cosign (requires OIDC/id-token)"),
-    cosign_identity: Optional[str] = typer.Option(None),
-    cosign_issuer: Optional[str] = typer.Option(None),
-    
-    # Modes
-    quiet: bool = typer.Option(False, "--quiet", "-q", help="Minimal output"),
-    json_mode: bool = typer.Option(False, "--json", help="Output JSON only"),
-    debug: bool = typer.Option(False, help="Enable debug logging")
-):
+def get_version() -> str:
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        from importlib_metadata import version
+    try:
+        return version("ci-evidence-pack")
+    except:
+        return "unknown"
+
+def run_pack(
+    repo: Path,
+    out: Path,
+    bundle_name: Optional[str],
+    include: List[str],
+    sbom: str,
+    collect_pip_freeze: bool,
+    collect_git: bool,
+    collection_git: Optional[str],
+    cosign_sign: bool,
+    cosign_identity: Optional[str],
+    cosign_issuer: Optional[str],
+    manifest_hash: str,
+    quiet: bool,
+    json_mode: bool,
+    debug: bool
+) -> int:
     """
-    Create an evidence bundle.
+    Create an evidence bundle. Returns the process exit code.
     """
     init_console(quiet=quiet, json_mode=json_mode)
     setup_logging(debug)
-    
+
     rich_enabled = bool(util.console) and (not quiet) and (not json_mode)
 
     # Handle aliases
@@ -78,17 +66,17 @@ def pack(
         else:
              logging.warning(f"Ignoring unrecognized value for deprecated flag: {val}. Defaulting to True.")
              collect_git = True
-    
+
     if not bundle_name:
         sha = os.environ.get("GITHUB_SHA", "nosha")[:7]
         run_id = os.environ.get("GITHUB_RUN_ID", "local")
         repo_name = repo.resolve().name
         bundle_name = f"ci-evidence-pack_{repo_name}_{sha}_{run_id}.tar.gz"
-        
+
     try:
         if rich_enabled and util.console:
             util.console.rule("[bold cyan]CI Evidence Pack - Generator[/bold cyan]")
-            
+
         result = create_bundle(
             repo_root=repo,
             output_dir=out,
@@ -100,9 +88,10 @@ def pack(
             collect_pip=collect_pip_freeze,
             cosign_sign=cosign_sign,
             cosign_identity=cosign_identity,
-            cosign_issuer=cosign_issuer
+            cosign_issuer=cosign_issuer,
+            manifest_hash=manifest_hash
         )
-        
+
         if json_mode:
             print_json(result)
         elif quiet:
@@ -110,78 +99,77 @@ def pack(
         else:
             # Rich Output
             from rich.table import Table
-            
+
             # Summary Table
             table = Table(title="Bundle Contents", show_header=True, header_style="bold magenta")
             table.add_column("Property", style="cyan")
             table.add_column("Value", style="green")
-            
+
             table.add_row("Bundle Path", result["bundle_path"])
             table.add_row("Files Packed", str(result["file_count"]))
             table.add_row("SBOM Tool", result["sbom_tool"])
             table.add_row("Signed", "✅ Yes" if result["signed"] else "No")
-            
+
             if rich_enabled and util.console:
                 util.console.print(table)
             print_success(f"Bundle created: {result['bundle_path']}")
-            
+
     except Exception as e:
         if json_mode:
             print_json({"error": str(e)})
-            raise typer.Exit(code=1)
+            return 1
         print_error(str(e))
-        raise typer.Exit(code=1)
-
-@app.command()
-def verify(
-    bundle: Path = typer.Argument(..., help="Path to bundle .tar.gz"),
-    sig: Optional[Path] = typer.Option(None, help="Path to .sig file"),
-    cert: Optional[Path] = typer.Option(None, help="Path to .crt file"),
-    identity: Optional[str] = typer.Option(None, help="Expected identity"),
-    issuer: Optional[str] = typer.Option(None, help="Expected issuer"),
-    
-    quiet: bool = typer.Option(False, "--quiet", "-q", help="Minimal output"),
-    json_mode: bool = typer.Option(False, "--json", help="Output JSON only"),
-    debug: bool = typer.Option(False, help="Enable debug logging")
-):
+        return 1
+    return 0
+
+def run_verify(
+    bundle: Path,
+    sig: Optional[Path],
+    cert: Optional[Path],
+    identity: Optional[str],
+    issuer: Optional[str],
+    quiet: bool,
+    json_mode: bool,
+    debug: bool
+) -> int:
     """
-    Verify an evidence bundle.
+    Verify an evidence bundle. Returns the process exit code.
     """
     init_console(quiet=quiet, json_mode=json_mode)
     setup_logging(debug)
 
     rich_enabled = bool(util.console) and (not quiet) and (not json_mode)
-    
+
     try:
         # Explicit check for bundle existence to match strict requirements
         if not bundle.exists():
             msg = f"Bundle not found: {bundle}"
             if json_mode:
                 print_json({"error": msg})
-                raise typer.Exit(code=1)
+                return 1
             else:
                 print_error(msg)
-                raise typer.Exit(code=1)
+                return 1
 
         if rich_enabled and util.console:
             util.console.rule("[bold cyan]CI Evidence Pack - Verifier[/bold cyan]")
-            
+
         result = verify_bundle(bundle, sig, cert, identity, issuer)
-        
+
         if result.get("error"):
             # Logic failure (verification failed)
             if json_mode:
                 # Still output JSON with error, then exit
                 print_json(result)
-                raise typer.Exit(code=2)
+                return 2
             elif quiet:
                 # Quiet mode failure? Spec says "suppress non-error logs".
                 # Errors should show.
                 print_error(result["error"])
-                raise typer.Exit(code=2)
+                return 2
             else:
                 print_error(result["error"])
-                raise typer.Exit(code=2)
+                return 2
 
         # Success path
         if json_mode:
@@ -190,22 +178,82 @@ def verify(
             print("OK")
         else:
             from rich.panel import Panel
-            
+
             if rich_enabled and util.console:
                 util.console.print(Panel(f"[bold green]Bundle Verified Successfully[/bold green]\n\nPath: {result['bundle_path']}", title="Verification Result", border_style="green"))
             print_success("Verification Complete")
 
-    except typer.Exit:
-        raise
     except Exception as e:
         # Runtime/Unexpected failure
         if json_mode:
             print_json({"error": str(e)})
-            raise typer.Exit(code=1)
+            return 1
         print_error(f"Runtime Error: {str(e)}")
-        raise typer.Exit(code=1)
+        return 1
+    return 0
+
+class FastParseError(Exception):
+    """Raised when the fast parser cannot handle argv; Typer takes over."""
+
+def build_fast_parser():
+    """
+    Builds a stdlib argparse mirror of the `pack` and `verify` commands.
+
+    Option names and defaults must match typer_app.py. Help and errors are
+    not handled here; they raise FastParseError so Typer renders them.
+    """
+    import argparse
+
+    class Parser(argparse.ArgumentParser):
+        def error(self, message):
+            raise FastParseError(message)
+
+    parser = Parser(prog="ci-evidence-pack", add_help=False, allow_abbrev=False)
+    sub = parser.add_subparsers(dest="command", parser_class=Parser)
+    flag = argparse.BooleanOptionalAction
+
+    p = sub.add_parser("pack", add_help=False, allow_abbrev=False)
+    p.add_argument("--repo", type=Path, default=Path("."))
+    p.add_argument("--out", type=Path, default=Path("dist"))
+    p.add_argument("--bundle-name", default=None)
+    p.add_argument("--include", action="append", default=[])
+    p.add_argument("--sbom", default="auto")
+    p.add_argument("--collect-pip-freeze", action=flag, default=True)
+    p.add_argument("--collect-git", action=flag, default=True)
+    p.add_argument("--collection-git", default=None)
+    p.add_argument("--cosign-sign", action=flag, default=False)
+    p.add_argument("--cosign-identity", default=None)
+    p.add_argument("--cosign-issuer", default=None)
+    p.add_argument("--manifest-hash", default="sha256")
+    p.add_argument("--quiet", "-q", action="store_true")
+    p.add_argument("--json", dest="json_mode", action="store_true")
+    p.add_argument("--debug", action=flag, default=False)
+
+    v = sub.add_parser("verify", add_help=False, allow_abbrev=False)
+    v.add_argument("bundle", type=Path)
+    v.add_argument("--sig", type=Path, default=None)
+    v.add_argument("--cert", type=Path, default=None)
+    v.add_argument("--identity", default=None)
+    v.add_argument("--issuer", default=None)
+    v.add_argument("--quiet", "-q", action="store_true")
+    v.add_argument("--json", dest="json_mode", action="store_true")
+    v.add_argument("--debug", action=flag, default=False)
+    return parser
 
 def main():
+    argv = sys.argv[1:]
+    # Fast path: plain pack/verify invocations skip importing typer/click
+    if argv and argv[0] in ("pack", "verify") and not {"--help", "-h"} & set(argv):
+        try:
+            args = vars(build_fast_parser().parse_args(argv))
+        except FastParseError:
+            args = None
+        if args is not None:
+            command = args.pop("command")
+            runner = run_pack if command == "pack" else run_verify
+            sys.exit(runner(**args))
+
+    from .typer_app import app
     app()
 
 if __name__ == "__main__":
@@ -1,21 +1,40 @@
 import sys
 import subprocess
+import contextlib
+import fnmatch
 import gzip
+import io
 import os
+import re
 import shutil
+import stat
 import tarfile
 import tempfile
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
 try:
     from importlib.metadata import version
 except ImportError:
     from importlib_metadata import version
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Union
 
-from .util import stable_json_write, run_command, logging, get_source_date_epoch
-from .manifest import generate_manifest
+# Optional ISA-L accelerated gzip (drop-in GzipFile, several times faster).
+# Note: compressed bytes differ between backends, so determinism holds per backend.
+try:
+    from isal import igzip as gzip_mod
+    GZIP_LEVEL = 3  # ISA-L's highest level
+except ImportError:
+    gzip_mod = gzip
+    GZIP_LEVEL = 9
+
+from .util import stable_json_dumps, run_command, logging, get_source_date_epoch, HashingWriter, HashingReader, iter_files, new_hasher
+from .manifest import render_manifest, MANIFEST_FILES, EXCLUDE_NAMES, PAX_MANIFEST_HASH
 from .sbom import generate_sbom
 
+def compile_excludes(exclude_globs: List[str]) -> "re.Pattern":
+    """Compiles exclude globs into one regex matched against bundle-relative POSIX paths."""
+    return re.compile("|".join(fnmatch.translate(g) for g in exclude_globs) or r"(?!)")
+
 def collect_git_info(repo_root: Path) -> Optional[Dict[str, str]]:
     """Collects git metadata if available."""
     if not shutil.which("git"):
@@ -33,25 +52,32 @@ def collect_git_info(repo_root: Path) -> Optional[Dict[str, str]]:
             return ""
 
     data = {}
-    sid = git(["rev-parse", "HEAD"])
-    if not sid:
+    # SHA and branch in a single rev-parse (one line per query)
+    heads = git(["rev-parse", "HEAD", "--abbrev-ref", "HEAD"]).splitlines()
+    if not heads:
         return None # Not working
+    
+    # The remaining queries are independent; run them concurrently
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        f_remote = ex.submit(git, ["config", "--get", "remote.origin.url"])
+        f_status = ex.submit(git, ["status", "--porcelain"])
+        f_desc = ex.submit(git, ["describe", "--tags", "--always", "--dirty"])
         
-    data["sha"] = sid
-    data["branch"] = git(["rev-parse", "--abbrev-ref", "HEAD"])
-    data["remote_url"] = git(["config", "--get", "remote.origin.url"])
+    data["sha"] = heads[0]
+    data["branch"] = heads[1] if len(heads) > 1 else ""
+    data["remote_url"] = f_remote.result()
     
     # dirty check
-    status = git(["status", "--porcelain"])
+    status = f_status.result()
     data["dirty"] = "true" if status else "false"
     
-    desc = git(["describe", "--tags", "--always", "--dirty"])
+    desc = f_desc.result()
     if desc:
         data["describe"] = desc
         
     return data
 
-def collect_pip_freeze() -> Optional[str]:
+def collect_pip_freeze() -> Optional[bytes]:
     """Collects pip freeze output if appropriate."""
     # Check if this looks like a python environment or project
     # Trigger if setup.py or pyproject.toml exists? 
@@ -64,10 +90,11 @@ def collect_pip_freeze() -> Optional[str]:
     
     try:
         # Check if pip is runnable
-        res = run_command([sys.executable, "-m", "pip", "freeze"], check=False)
+        # Raw bytes: pip output is ASCII, so skip decoding and re-encoding
+        res = run_command([sys.executable, "-m", "pip", "freeze"], check=False, text=False)
         if res.returncode == 0:
             lines = res.stdout.splitlines()
-            return "\n".join(sorted(lines)) + "\n"
+            return b"\n".join(sorted(lines)) + b"\n"
     except Exception:
         pass
     return None
@@ -92,21 +119,50 @@ def create_bundle(
     collect_pip: bool,
     cosign_sign: bool,
     cosign_identity: Optional[str],
-    cosign_issuer: Optional[str]
+    cosign_issuer: Optional[str],
+    manifest_hash: str = "sha256"
 ) -> Dict[str, Any]:
     
+    if manifest_hash not in MANIFEST_FILES:
+        raise ValueError(f"Unsupported manifest hash '{manifest_hash}' (choose from: {', '.join(MANIFEST_FILES)})")
+    
     # Ensure absolute paths
     repo_root = repo_root.resolve()
     output_dir = output_dir.resolve()
+    epoch = get_source_date_epoch()
+    
+    # Bundle contents, keyed by POSIX arcname. Values are either the bytes
+    # of a generated file or the (path, stat) of a file on disk, which is
+    # streamed straight into the tar: nothing is staged in a temp directory.
+    members: Dict[str, Union[bytes, Tuple[str, os.stat_result]]] = {}
+    
+    # Excluded names/globs (matched against arcnames) prune whole directories.
+    exclude_re = compile_excludes(exclude_globs)
+    
+    bundle_path = output_dir / bundle_name
+    # Identity of an existing bundle: includes are walked following symlinks,
+    # so it may turn up under another path.
+    try:
+        bst = bundle_path.stat()
+        bundle_id = (bst.st_dev, bst.st_ino)
+    except OSError:
+        bundle_id = None
+    
+    def add_file(arcname: str, st: os.stat_result, path: str):
+        # Never pack the bundle we are about to (re)write
+        if path == str(bundle_path) or (st.st_dev, st.st_ino) == bundle_id:
+            return
+        if exclude_re.match(arcname) is None:
+            members[arcname] = (path, st)
     
-    # Staging area
-    with tempfile.TemporaryDirectory() as stage_str:
-        stage_dir = Path(stage_str)
+    def add_bytes(arcname: str, data: bytes):
+        if exclude_re.match(arcname) is None:
+            members[arcname] = data
+    
+    # Only external SBOM tools need a scratch directory (they write to a path)
+    with contextlib.ExitStack() as stack:
         
         # --- 1. Artifacts ---
-        artifacts_dir = stage_dir / "artifacts"
-        artifacts_dir.mkdir()
-        
         input_log = []
         
         for inc_str in includes:
@@ -135,22 +191,32 @@ def create_bundle(
                 except ValueError:
                     logging.warning(f"Absolute path {inc_str} is not inside repo {repo_root}. Skipping.")
                     continue
+            if ".." in clean_rel.parts:
+                logging.warning(f"Include path {inc_str} escapes the artifacts tree. Skipping.")
+                continue
             
-            dest_path = artifacts_dir / clean_rel
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            dest = PurePosixPath("artifacts", clean_rel.as_posix())
             
             if src_path.is_dir():
-                # copytree
-                shutil.copytree(src_path, dest_path, dirs_exist_ok=True)
+                # Symlinks are followed, as a copytree of the directory would
+                src_prefix = len(str(src_path)) + 1
+                
+                def excluded(entry, dest=dest, src_prefix=src_prefix):
+                    if entry.name in EXCLUDE_NAMES:
+                        return True
+                    rel = entry.path[src_prefix:].replace(os.sep, "/")
+                    return exclude_re.match(f"{dest}/{rel}") is not None
+                
+                for e in iter_files(src_path, prune=excluded, follow_symlinks=True):
+                    rel = e.path[src_prefix:].replace(os.sep, "/")
+                    add_file(f"{dest}/{rel}", e.stat(), e.path)
                 input_log.append({"src": str(clean_rel), "type": "dir"})
             else:
-                shutil.copy2(src_path, dest_path)
+                if src_path.name not in EXCLUDE_NAMES:
+                    add_file(str(dest), src_path.stat(), str(src_path))
                 input_log.append({"src": str(clean_rel), "type": "file"})
                 
         # --- 2. Metadata ---
-        metadata_dir = stage_dir / "metadata"
-        metadata_dir.mkdir()
-        
         # metadata.json (Tool info)
         try:
             v = version("ci-evidence-pack")
@@ -160,13 +226,13 @@ def create_bundle(
         tool_meta = {
             "tool": "ci-evidence-pack",
             "version": v,
-            "created_at_epoch": get_source_date_epoch()
+            "created_at_epoch": epoch
         }
-        stable_json_write(metadata_dir / "metadata.json", tool_meta)
+        add_bytes("metadata/metadata.json", stable_json_dumps(tool_meta))
 
         # run.json
         run_data = {
-            "source_date_epoch": get_source_date_epoch(),
+            "source_date_epoch": epoch,
             "repo": os.environ.get("GITHUB_REPOSITORY"),
             "run_id": os.environ.get("GITHUB_RUN_ID"),
             "sha": os.environ.get("GITHUB_SHA"),
@@ -178,28 +244,29 @@ def create_bundle(
         }
         # Filter empty
         run_data = {k: v for k, v in run_data.items() if v}
-        stable_json_write(metadata_dir / "run.json", run_data)
+        add_bytes("metadata/run.json", stable_json_dumps(run_data))
         
         # git.json
         if collect_git:
             gdata = collect_git_info(repo_root)
             if gdata:
-                stable_json_write(metadata_dir / "git.json", gdata)
+                add_bytes("metadata/git.json", stable_json_dumps(gdata))
                 
         # --- 3. Deps ---
-        deps_dir = stage_dir / "deps"
         if collect_pip:
             # Should we look for python files to confirm project type?
             # Or just try? The prompt says "only if python project is detected".
             # Let's look for known python files in repo_root.
-            has_python = any((repo_root / f).exists() for f in ["pyproject.toml", "setup.py", "requirements.txt"]) or list(repo_root.glob("*.py"))
+            # glob() is lazy, so this stops at the first top-level .py file
+            has_python = (
+                any((repo_root / f).exists() for f in ("pyproject.toml", "setup.py", "requirements.txt"))
+                or next(repo_root.glob("*.py"), None) is not None
+            )
             
             if has_python:
                 pf = collect_pip_freeze()
                 if pf:
-                    deps_dir.mkdir(exist_ok=True)
-                    with open(deps_dir / "pip_freeze.txt", "w", encoding="utf-8") as f:
-                        f.write(pf)
+                    add_bytes("deps/pip_freeze.txt", pf)
                         
         # --- 4. SBOM ---
         # Determine filename
@@ -213,40 +280,81 @@ def create_bundle(
             else: eff_tool = "none"
             
         if eff_tool != "none":
-            sbom_dir = stage_dir / "sbom"
-            sbom_dir.mkdir()
+            scratch = Path(stack.enter_context(tempfile.TemporaryDirectory()))
             filename = "sbom.cdx.json" if eff_tool == "cyclonedx" else "sbom.syft.json"
-            generate_sbom(sbom_dir / filename, sbom_format)
+            generate_sbom(scratch / filename, sbom_format)
+            if (scratch / filename).is_file():
+                add_file(f"sbom/{filename}", (scratch / filename).stat(), str(scratch / filename))
             
         # --- 5. Manifest ---
-        manifest_dir = stage_dir / "manifest"
-        manifest_dir.mkdir(exist_ok=True)
-        stable_json_write(manifest_dir / "inputs.json", sorted(input_log, key=lambda x: x["src"]))
+        add_bytes("manifest/inputs.json", stable_json_dumps(sorted(input_log, key=lambda x: x["src"])))
         
-        # Hash everything
-        generate_manifest(stage_dir)
+        # Files are hashed as they stream into the tar (step 6); the resulting
+        # manifest/sha256sum.txt (or the --manifest-hash equivalent) is appended as the final tar entry.
+        manifest_rel = f"manifest/{MANIFEST_FILES[manifest_hash]}"
+        members.pop(manifest_rel, None)
         
         # --- 6. Pack ---
         output_dir.mkdir(parents=True, exist_ok=True)
-        bundle_path = output_dir / bundle_name
         
         logging.info(f"Writing bundle to {bundle_path}...")
         
-        # Sorted walk
-        # We need all files in stage_dir
+        # Sorted by arcname
         # We start gzip with strict mtime
-        with open(bundle_path, "wb") as f_out:
-            # mtime=0 in gzip header for determinism
-            with gzip.GzipFile(filename="", mode="wb", fileobj=f_out, mtime=0) as f_gzip:
-                with tarfile.open(fileobj=f_gzip, mode="w:") as tar:
+        # Written to a temp file in output_dir and renamed into place, so a
+        # failed pack never leaves a truncated bundle behind.
+        tmp_path = output_dir / f".{bundle_name}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f_out:
+                # Hash the compressed stream as it is written so the bundle
+                # never has to be read back from disk.
+                f_hash = HashingWriter(f_out)
+                # mtime=0 in gzip header for determinism
+                with gzip_mod.GzipFile(filename="", mode="wb", fileobj=f_hash, mtime=0, compresslevel=GZIP_LEVEL) as f_gzip:
+                    # Streaming mode: the gzip writer is not seekable anyway
+                    # manifest algorithm goes up front as a global PAX header
+                    with tarfile.open(
+                        fileobj=f_gzip, mode="w|", format=tarfile.PAX_FORMAT, bufsize=1 << 20,
+                        pax_headers={PAX_MANIFEST_HASH: manifest_hash}
+                    ) as tar:
+                    
+                        hashes: Dict[str, str] = {}
+                        for arcname in sorted(members):
+                            src = members[arcname]
+                            # Build the header ourselves instead of letting
+                            # tar.add stat the file again.
+                            ti = tarfile.TarInfo(name=arcname)
+                            ti.type = tarfile.REGTYPE
+                            if isinstance(src, bytes):
+                                ti.size = len(src)
+                                ti.mode = 0o644
+                                tar.addfile(normalize_tarinfo(ti), io.BytesIO(src))
+                                h = new_hasher(manifest_hash)
+                                h.update(src)
+                                hashes[arcname] = h.hexdigest()
+                                continue
+                        
+                            path, st = src
+                            ti.size = st.st_size
+                            ti.mode = stat.S_IMODE(st.st_mode)
+                            with open(path, "rb") as fh:
+                                reader = HashingReader(fh, manifest_hash)
+                                tar.addfile(normalize_tarinfo(ti), reader)
+                            hashes[arcname] = reader.hexdigest()
                     
-                    # Gather all files
-                    all_files = sorted(stage_dir.rglob("*"))
-                    for p in all_files:
-                        if p.name == ".DS_Store": continue
+                        # Second phase: the manifest, built from in-memory hashes
+                        manifest_bytes = render_manifest(hashes)
+                        ti = tarfile.TarInfo(name=manifest_rel)
+                        ti.size = len(manifest_bytes)
+                        ti.mode = 0o644
+                        ti.type = tarfile.REGTYPE
+                        tar.addfile(normalize_tarinfo(ti), io.BytesIO(manifest_bytes))
+                        logging.info(f"Generated {manifest_rel} with {len(hashes)} files.")
                         
-                        rel_path = p.relative_to(stage_dir)
-                        tar.add(p, arcname=str(rel_path), filter=normalize_tarinfo, recursive=False)
+            os.replace(tmp_path, bundle_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
                         
     # --- 7. Sign ---
     sig_path = None
@@ -281,32 +389,18 @@ def create_bundle(
         except subprocess.CalledProcessError:
             raise RuntimeError("Cosign signing failed.")
 
-    from .util import compute_file_sha256
-    
-    # Calculate bundle hash here to return
-    bundle_sha = compute_file_sha256(bundle_path)
-    
-    # Count files in manifest
-    manifest_count = 0 
-    # Use manifest generation return? or read input_log?
-    # input_log only touches inputs, not generated metadata files.
-    # To get total files in bundle, we tracked them during pack?
-    # Or just say "N files packed". 
-    # We can use the file list we gathered for tar.
-    # We didn't save it. Re-globbing stage_dir is risky as it is deleted.
-    # We know generate_manifest hashes everything.
-    # Let's just update generate_manifest to distinct files or we can use tar member count if we care.
-    # Or just input_log count (user artifacts) + metadata.
-    # Simpler: just count during the previous glob.
+    # Bundle hash was computed inline while writing
+    bundle_sha = f_hash.hexdigest()
     
     # Pack result
     return {
         "bundle_path": str(bundle_path),
         "bundle_sha256": bundle_sha,
-        "file_count": len(all_files), # from the tar loop
+        "file_count": len(hashes) + 1, # from the tar loop, plus the manifest
+        "manifest_hash": manifest_hash,
         "sbom_tool": eff_tool,
         "signed": signed,
         "sig_path": str(sig_path) if sig_path else None,
         "cert_path": str(cert_path) if cert_path else None,
-        "source_date_epoch": get_source_date_epoch()
+        "source_date_epoch": epoch
     }
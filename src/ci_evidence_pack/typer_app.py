@@ -0,0 +1,77 @@
+import typer
+from pathlib import Path
+from typing import List, Optional
+
+from .cli import get_version, run_pack, run_verify
+
+app = typer.Typer(help="CI Evidence Pack Generator", add_completion=False)
+
+def version_callback(value: bool):
+    if value:
+        typer.echo(f"ci-evidence-pack v{get_version()} - Made by OrygnsCode")
+        raise typer.Exit()
+
+@app.callback()
+def main_callback(
+    version: Optional[bool] = typer.Option(
+        None, "--version", callback=version_callback, is_eager=True, help="Show version."
+    )
+):
+    pass
+
+@app.command()
+
+def pack(
+    repo: Path = typer.Option(Path("."), help="Path to repo root"),
+    out: Path = typer.Option(Path("dist"), help="Output directory"),
+    bundle_name: Optional[str] = typer.Option(None, help="Override bundle filename"),
+    include: List[str] = typer.Option([], help="Files/dirs to include (relative to repo)"),
+    sbom: str = typer.Option("auto", help="SBOM tool: cyclonedx, syft, none, auto"),
+    collect_pip_freeze: bool = typer.Option(True, help="Collect pip freeze if python detected"),
+    collect_git: bool = typer.Option(True, help="Collect git metadata"),
+
+    # Deprecated aliases
+    collection_git: Optional[str] = typer.Option(None, "--collection-git", hidden=True, help="Deprecated alias for --collect-git"),
+
+    # Signing
+    cosign_sign: bool = typer.Option(False, help="Sign with Cosign (requires OIDC/id-token)"),
+    cosign_identity: Optional[str] = typer.Option(None),
+    cosign_issuer: Optional[str] = typer.Option(None),
+
+    # Manifest
+    manifest_hash: str = typer.Option("sha256", help="Manifest hash: sha256, blake3 (needs the blake3 package)"),
+
+    # Modes
+    quiet: bool = typer.Option(False, "--quiet", "-q", help="Minimal output"),
+    json_mode: bool = typer.Option(False, "--json", help="Output JSON only"),
+    debug: bool = typer.Option(False, help="Enable debug logging")
+):
+    """
+    Create an evidence bundle.
+    """
+    code = run_pack(
+        repo, out, bundle_name, include, sbom, collect_pip_freeze, collect_git,
+        collection_git, cosign_sign, cosign_identity, cosign_issuer,
+        manifest_hash, quiet, json_mode, debug
+    )
+    if code:
+        raise typer.Exit(code=code)
+
+@app.command()
+def verify(
+    bundle: Path = typer.Argument(..., help="Path to bundle .tar.gz"),
+    sig: Optional[Path] = typer.Option(None, help="Path to .sig file"),
+    cert: Optional[Path] = typer.Option(None, help="Path to .crt file"),
+    identity: Optional[str] = typer.Option(None, help="Expected identity"),
+    issuer: Optional[str] = typer.Option(None, help="Expected issuer"),
+
+    quiet: bool = typer.Option(False, "--quiet", "-q", help="Minimal output"),
+    json_mode: bool = typer.Option(False, "--json", help="Output JSON only"),
+    debug: bool = typer.Option(False, help="Enable debug logging")
+):
+    """
+    Verify an evidence bundle.
+    """
+    code = run_verify(bundle, sig, cert, identity, issuer, quiet, json_mode, debug)
+    if code:
+        raise typer.Exit(code=code)
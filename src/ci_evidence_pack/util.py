@@ -3,19 +3,33 @@ import logging
 import subprocess
 import os
 import json
+import functools
 import hashlib
-from typing import List, Dict, Optional, Any
+import mmap
+import zlib
+from typing import List, Dict, Optional, Any, Callable, Iterator, Union
 from pathlib import Path
 
-# Try to import Rich, fail gracefully if not installed (though deps say it should be)
+# Optional fast JSON serializer; output matches the stdlib path byte-for-byte
 try:
-    from rich.console import Console
-    from rich.theme import Theme
+    import orjson
 except ImportError:
-    Console = None
-    
+    orjson = None
+
+# Optional BLAKE3 for manifest hashing (--manifest-hash blake3)
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
+# Read size for chunked hashing
+HASH_CHUNK_SIZE = 1 << 20
+
+# Files up to this size are hashed from a single read
+SMALL_FILE_SIZE = 64 << 10
+
 # Global console object
-console: Optional["Console"] = None
+console: Optional[Any] = None  # rich.console.Console when enabled
 _quiet_mode: bool = False
 _json_mode: bool = False
 
@@ -25,26 +39,188 @@ def init_console(quiet: bool = False, json_mode: bool = False):
     _quiet_mode = quiet
     _json_mode = json_mode
     
-    if Console and not quiet and not json_mode:
-        custom_theme = Theme({
-            "info": "cyan",
-            "warning": "yellow",
-            "error": "bold red",
-            "success": "bold green"
-        })
-        console = Console(theme=custom_theme, stderr=True)
-    else:
-        # No rich console in quiet/json or if missing
+    if quiet or json_mode:
+        # No rich console in quiet/json; skip importing rich entirely
+        console = None
+        return
+    
+    # Rich is imported lazily (it is slow to import); fail gracefully if
+    # not installed (though deps say it should be)
+    try:
+        from rich.console import Console
+        from rich.theme import Theme
+    except ImportError:
         console = None
+        return
+    
+    custom_theme = Theme({
+        "info": "cyan",
+        "warning": "yellow",
+        "error": "bold red",
+        "success": "bold green"
+    })
+    console = Console(theme=custom_theme, stderr=True)
+
+def new_hasher(algo: str = "sha256"):
+    """
+    Returns a fresh hash object for `algo` ("sha256" or "blake3").
+    
+    Manifest hashes are integrity checks inside a separately signed bundle,
+    so hashlib is asked for its usedforsecurity=False implementation.
+    """
+    if algo == "blake3":
+        if blake3 is None:
+            raise RuntimeError("BLAKE3 manifest hashing requested but the 'blake3' package is not installed.")
+        return blake3()
+    return hashlib.new(algo, usedforsecurity=False)
 
 def compute_file_sha256(path: Path) -> str:
     """Compute SHA256 hash of a file."""
-    sha = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            sha.update(chunk)
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= SMALL_FILE_SIZE:
+            # Small files (most metadata/text artifacts): one read, one update.
+            # Also covers empty files, which mmap cannot map.
+            return hashlib.sha256(f.read()).hexdigest()
+
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: the read loop runs in C
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+        sha = hashlib.sha256()
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                sha.update(mm)
+        except (OSError, ValueError):
+            # Not mappable (e.g. special files); stream in 1 MiB chunks
+            f.seek(0)
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                sha.update(chunk)
     return sha.hexdigest()
 
+def iter_files(
+    root: Union[str, Path],
+    prune: Optional[Callable[[os.DirEntry], bool]] = None,
+    follow_symlinks: bool = False
+) -> Iterator[os.DirEntry]:
+    """
+    Recursively yields DirEntry objects for regular files under root.
+    
+    Uses os.scandir so file types come from the cached dirent data instead
+    of an extra stat per entry. Symlinks are not followed unless
+    follow_symlinks is set. Entries for which `prune` returns True are
+    skipped; for directories, without descending.
+    """
+    with os.scandir(root) as it:
+        for entry in it:
+            if prune is not None and prune(entry):
+                continue
+            if entry.is_dir(follow_symlinks=follow_symlinks):
+                yield from iter_files(entry.path, prune, follow_symlinks)
+            elif entry.is_file(follow_symlinks=follow_symlinks):
+                yield entry
+
+class HashingWriter:
+    """File-like wrapper that SHA256-hashes every byte written through it."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self.sha.update(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+    def hexdigest(self) -> str:
+        return self.sha.hexdigest()
+
+class HashingReader:
+    """File-like wrapper that hashes (SHA256 by default) every byte read through it."""
+
+    def __init__(self, fileobj, algo: str = "sha256"):
+        self.fileobj = fileobj
+        self.sha = new_hasher(algo)
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        self.sha.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self.sha.hexdigest()
+
+class GunzipHashingReader:
+    """
+    File-like gunzip over a raw .gz file object, for tarfile's "r|" mode.
+    
+    Compressed bytes are read in HASH_CHUNK_SIZE chunks, SHA256-hashed (the
+    digest of the .gz itself) and inflated with one zlib.decompressobj, so
+    the file is read once for both the archive contents and its digest.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha = hashlib.sha256()
+        self.decomp = zlib.decompressobj(wbits=31) # gzip header + trailer
+        self.pending = b"" # compressed bytes not yet fed to zlib
+        self.more = False # last inflate hit max_length; zlib may hold output
+        self.buf = bytearray()
+        self.eof = False
+
+    def fill(self, size: int):
+        """Inflates until `size` bytes are buffered (or EOF), never much more."""
+        while len(self.buf) < size:
+            if not self.pending and not self.more:
+                if self.eof:
+                    break
+                chunk = self.fileobj.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    self.eof = True
+                    if not self.decomp.eof:
+                        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+                    break
+                self.sha.update(chunk)
+                self.pending = chunk
+            if self.decomp.eof:
+                # Concatenated members / zero padding, as gzip.GzipFile accepts
+                self.pending = self.pending.lstrip(b"\x00")
+                if not self.pending:
+                    continue
+                self.decomp = zlib.decompressobj(wbits=31)
+            # Bounded inflate (at most ~HASH_CHUNK_SIZE past `size`), so a tiny
+            # high-ratio input cannot balloon the buffer
+            want = max(size - len(self.buf), HASH_CHUNK_SIZE)
+            out = self.decomp.decompress(self.pending, want)
+            self.buf += out
+            self.more = len(out) == want and not self.decomp.eof
+            self.pending = self.decomp.unused_data if self.decomp.eof else self.decomp.unconsumed_tail
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            # Whole remainder: callers asking for this accept the memory
+            while not self.eof:
+                self.fill(len(self.buf) + HASH_CHUNK_SIZE)
+        else:
+            self.fill(size)
+        if size < 0 or size >= len(self.buf):
+            data = bytes(self.buf)
+            self.buf.clear()
+        else:
+            data = bytes(self.buf[:size])
+            del self.buf[:size]
+        return data
+
+    def hexdigest(self) -> str:
+        """SHA256 of the whole .gz; reads (and integrity-checks) any remainder first."""
+        self.buf.clear()
+        while not self.eof:
+            self.fill(HASH_CHUNK_SIZE)
+            self.buf.clear()
+        return self.sha.hexdigest()
+
 def print_json(data: Any):
     """Print data as JSON to stdout."""
     print(json.dumps(data, indent=2, sort_keys=True))
@@ -105,14 +281,18 @@ def run_command(
     cmd: List[str], 
     cwd: Optional[Path] = None, 
     env: Optional[Dict[str, str]] = None,
-    check: bool = True
+    check: bool = True,
+    text: bool = True
 ) -> subprocess.CompletedProcess:
-    """Run a subprocess command and return the result."""
+    """
+    Run a subprocess command and return the result.
+    
+    With text=False stdout/stderr are returned as raw bytes (no decoding).
+    """
     logging.debug(f"Running command: {' '.join(cmd)}")
     try:
-        proc_env = os.environ.copy()
-        if env:
-            proc_env.update(env)
+        # env=None inherits the parent environment without copying it
+        proc_env = {**os.environ, **env} if env else None
 
         return subprocess.run(
             cmd,
@@ -120,7 +300,7 @@ def run_command(
             env=proc_env,
             check=check,
             capture_output=True,
-            text=True
+            text=text
         )
     except subprocess.CalledProcessError as e:
         logging.debug(f"Command failed with output: {e.stdout}")
@@ -129,17 +309,27 @@ def run_command(
             raise
         return e
 
-def get_source_date_epoch() -> int:
-    """Returns SOURCE_DATE_EPOCH as int, defaulting to 0."""
-    val = os.environ.get("SOURCE_DATE_EPOCH", "0")
+@functools.lru_cache(maxsize=8)
+def parse_source_date_epoch(val: str) -> int:
+    """Parses a SOURCE_DATE_EPOCH value; cached so the warning fires once per value."""
     try:
         return int(val)
     except ValueError:
         logging.warning(f"Invalid SOURCE_DATE_EPOCH '{val}', defaulting to 0")
         return 0
 
-def stable_json_write(path: Path, data: Any):
-    """Writes JSON to file deterministically (sorted keys, indent=2, utf-8, newline)."""
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, sort_keys=True, ensure_ascii=False)
-        f.write("\n")
+def get_source_date_epoch() -> int:
+    """Returns SOURCE_DATE_EPOCH as int, defaulting to 0."""
+    # Keyed on the raw value so a changed environment is still honoured
+    return parse_source_date_epoch(os.environ.get("SOURCE_DATE_EPOCH", "0"))
+
+def stable_json_dumps(data: Any) -> bytes:
+    """Serializes JSON deterministically (sorted keys, indent=2, utf-8, newline)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2) + b"\n"
+        except TypeError:
+            # Types orjson rejects (e.g. non-str keys) take the stdlib path
+            pass
+    text = json.dumps(data, indent=2, sort_keys=True, ensure_ascii=False)
+    return (text + "\n").encode("utf-8")
@@ -1,46 +1,156 @@
+import functools
+import posixpath
 import shutil
 import tarfile
-import tempfile
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any
-from .util import run_command
-from .manifest import calculate_file_hash
+from typing import Optional, Dict, Any, Tuple, List
+from .util import run_command, new_hasher, compute_file_sha256, GunzipHashingReader, HASH_CHUNK_SIZE
+from .manifest import MANIFEST_FILES, EXCLUDE_NAMES, PAX_MANIFEST_HASH
+
+# Tar member names of the supported manifests, mapped to their hash algorithm
+MANIFEST_MEMBERS = {f"manifest/{name}": algo for algo, name in MANIFEST_FILES.items()}
+
+# Manifest lines are "<64 hex chars><two spaces><path>"
+MANIFEST_HEX_LEN = 64
+MANIFEST_PATH_OFFSET = MANIFEST_HEX_LEN + 2
+
+# Manifests are read whole, so cap their size before reading (a few hundred
+# thousand entries). Larger members named like a manifest are rejected.
+MAX_MANIFEST_SIZE = 32 << 20
+
+# Names in error messages come from the (untrusted) archive: keep them short
+MAX_ERROR_PATH_LEN = 200
+
+# Successful cosign verifications, keyed by content digests of the inputs.
+# Failures are never stored, so a rejected signature is always re-checked.
+# Opt-in (cache=True): computing the key reads every input, which only pays
+# off when the same bundle is verified again in this process. It trusts the
+# inputs to stay put while cosign runs; it is not a defence against swaps.
+COSIGN_CACHE_SIZE = 256
+cosign_verified: "OrderedDict[Tuple, bool]" = OrderedDict()
+cosign_cache_lock = threading.Lock()
+
+# Member types rejected outright (strict mode)
+LINK_TYPES = frozenset({tarfile.SYMTYPE, tarfile.LNKTYPE})
+
+def short_path(name: str) -> str:
+    """Truncates an archive path for error messages."""
+    if len(name) <= MAX_ERROR_PATH_LEN:
+        return name
+    return f"{name[:MAX_ERROR_PATH_LEN]}... ({len(name)} chars)"
+
+def check_member(member: tarfile.TarInfo) -> None:
+    """
+    Rejects unsafe tar members: absolute paths, path traversal, links.
+    
+    Plain string checks (no PurePath per member). Backslashes and drive
+    letters are checked too, so names that would be absolute or climb out
+    on Windows are rejected everywhere.
+    """
+    name = member.name
+    if name.startswith(("/", "\\")) or name[1:2] == ":": # POSIX root, UNC/root, drive
+        raise Exception(f"Unsafe absolute path: {short_path(name)}")
+    if ".." in name.replace("\\", "/").split("/"):
+         raise Exception(f"Unsafe path traversal: {short_path(name)}")
+    
+    # Check for symlinks pointing outside?
+    if member.type in LINK_TYPES:
+         # Strict mode: block all symlinks/hardlinks
+         raise Exception(f"Unsafe symlink/hardlink blocked: {short_path(name)}")
 
 def safe_extract(tar: tarfile.TarFile, path: Path):
     """
     Extracts tarfile member safely, preventing path traversal.
+    
+    Members are checked and extracted in one pass in archive order, so this
+    also works on (and is fastest with) streaming "r|gz" archives.
     """
-    for member in tar.getmembers():
-        member_path = Path(member.name)
-        if member_path.is_absolute():
-            raise Exception(f"Unsafe absolute path: {member.name}")
-        if ".." in member_path.parts:
-             raise Exception(f"Unsafe path traversal: {member.name}")
+    if hasattr(tarfile, "data_filter"):
+        # PEP 706 (3.12+, backported to 3.8.17+/3.9.17+/3.10.12+/3.11.4+):
+        # extractall with the "data" filter. Our strict checks still run first,
+        # since "data" allows symlinks/hardlinks that stay inside `path`.
+        def strict_data_filter(member: tarfile.TarInfo, dest_path: str):
+            check_member(member)
+            return tarfile.data_filter(member, dest_path)
         
-        # Check for symlinks pointing outside?
-        if member.issym() or member.islnk():
-             # Strict mode: block all symlinks/hardlinks
-             raise Exception(f"Unsafe symlink/hardlink blocked: {member.name}")
+        try:
+            tar.extractall(path=path, filter=strict_data_filter)
+        except tarfile.AbsolutePathError as e:
+            raise Exception(f"Unsafe absolute path: {short_path(e.tarinfo.name)}")
+        except tarfile.OutsideDestinationError as e:
+            raise Exception(f"Unsafe path traversal: {short_path(e.tarinfo.name)}")
+        except tarfile.FilterError as e:
+            raise Exception(f"Unsafe member blocked: {short_path(e.tarinfo.name)} ({type(e).__name__})")
+        return
+    
+    for member in tar:
+        check_member(member)
              
         # Extract
         tar.extract(member, path=path, set_attrs=False) # set_attrs=False avoids permission issues
 
+@functools.lru_cache(maxsize=None)
+def cosign_path() -> Optional[str]:
+    """Resolves the cosign binary once per process (None if not on PATH)."""
+    return shutil.which("cosign")
+
+def reset_cosign_cache() -> None:
+    """Forgets the resolved cosign binary and cached verifications (for tests)."""
+    cosign_path.cache_clear()
+    with cosign_cache_lock:
+        cosign_verified.clear()
+
+def cosign_cache_key(
+    bundle_path: Path,
+    sig_path: Path,
+    cert_path: Path,
+    identity: Optional[str],
+    issuer: Optional[str]
+) -> Optional[Tuple]:
+    """Content digests of the inputs plus the policy; None if unreadable."""
+    try:
+        return (
+            compute_file_sha256(bundle_path),
+            compute_file_sha256(sig_path),
+            compute_file_sha256(cert_path),
+            identity,
+            issuer,
+        )
+    except OSError:
+        return None # Let cosign report it
+
 def verify_cosign(
     bundle_path: Path, 
     sig_path: Path, 
     cert_path: Path, 
     identity: Optional[str], 
-    issuer: Optional[str]
+    issuer: Optional[str],
+    cache: bool = False
 ) -> None:
-    if not shutil.which("cosign"):
+    cosign = cosign_path()
+    if not cosign:
         logging.warning("Cosign not found; cannot verify signature.")
         # Fail or just warn? Prompt: "return exit code 0.. 2 on evidence invalid .. 1 on runtime".
         # If user PROVIDED sig+cert, they expect verification.
         raise RuntimeError("Cosign binary missing.")
 
+    # Same bytes + same policy as an earlier success: skip the subprocess
+    key = cosign_cache_key(bundle_path, sig_path, cert_path, identity, issuer) if cache else None
+    if key is not None:
+        with cosign_cache_lock:
+            hit = key in cosign_verified
+            if hit:
+                cosign_verified.move_to_end(key)
+        if hit:
+            logging.info("Signature Verified (cached).")
+            return
+
     cmd = [
-        "cosign", "verify-blob",
+        cosign, "verify-blob",
         "--certificate", str(cert_path),
         "--signature", str(sig_path),
         str(bundle_path)
@@ -57,75 +167,151 @@ def verify_cosign(
         logging.error("Signature verification failed.")
         raise RuntimeError("Signature INVALID.")
 
-def verify_manifest(extracted_dir: Path) -> None:
-    manifest_file = extracted_dir / "manifest" / "sha256sum.txt"
-    if not manifest_file.exists():
-        raise ValueError("Manifest file missing from bundle.")
+    # Only positives are cached. The key is hashed before cosign reads the
+    # files, so callers must not rewrite the inputs while verifying.
+    if key is None:
+        return
+    with cosign_cache_lock:
+        cosign_verified[key] = True
+        if len(cosign_verified) > COSIGN_CACHE_SIZE:
+            cosign_verified.popitem(last=False)
 
-    # 1. Load Expected
+def parse_manifest(raw: bytes) -> Dict[str, str]:
+    """
+    Parses manifest bytes ("hash  path" lines) into {path: hash}.
+    
+    Every supported algorithm emits 64 hex chars, so lines are sliced at fixed
+    offsets instead of stripped and split. The hex prefix is ASCII, so the
+    offsets are the same after decoding the whole file once.
+    """
     expected = {}
-    with open(manifest_file, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line: continue
-            parts = line.split("  ", 1)
-            if len(parts) != 2:
-                continue
-            h, p = parts
-            expected[p] = h
-
-    # 2. Check all expected files
-    # Also check for UNEXPECTED files (strict mode)
-    # Walk directory
-    
-    found_paths = set()
-    
-    # We walk relative
-    for p in extracted_dir.rglob("*"):
-        if not p.is_file(): continue
-        if p.name == ".DS_Store": continue
-        
-        rel = p.relative_to(extracted_dir)
-        rel_str = str(rel)
-        
-        # Ignore manifest file itself for hash check
-        if rel_str == str(Path("manifest/sha256sum.txt")):
+    for line in raw.decode("utf-8").split("\n"):
+        if len(line) <= MANIFEST_PATH_OFFSET:
+            continue
+        expected[line[MANIFEST_PATH_OFFSET:]] = line[:MANIFEST_HEX_LEN]
+    return expected
+
+def hash_tar_members(tar: tarfile.TarFile, algo: str) -> Tuple[Dict[str, str], Dict[str, bytes]]:
+    """
+    Single streaming pass over a tar: safety-checks every member and hashes
+    each regular file's payload straight from the archive.
+    
+    Returns ({path: hash}, {manifest member name: manifest bytes}).
+    """
+    found: Dict[str, str] = {}
+    manifests: Dict[str, bytes] = {}
+    for member in tar:
+        check_member(member)
+        if not member.isreg():
+            # Directories etc. carry no content to verify
             continue
-            
-        found_paths.add(rel_str)
         
-        if rel_str not in expected:
-            # Found file not in manifest
-            raise ValueError(f"Unexpected file in bundle: {rel_str}")
+        name = posixpath.normpath(member.name)
+        if posixpath.basename(name) in EXCLUDE_NAMES:
+            continue
         
-        # Check hash
-        curr = calculate_file_hash(p)
-        if curr != expected[rel_str]:
-            raise ValueError(f"Hash mismatch for {rel_str}: expected {expected[rel_str]}, got {curr}")
-            
-    # 3. Check for missing
-    for p in expected:
-        if p not in found_paths:
-             raise ValueError(f"Missing file declared in manifest: {p}")
+        f = tar.extractfile(member)
+        h = new_hasher(algo)
+        if name in MANIFEST_MEMBERS:
+            if member.size > MAX_MANIFEST_SIZE:
+                raise ValueError(f"Manifest too large: {name} ({member.size} bytes, max {MAX_MANIFEST_SIZE})")
+            data = f.read()
+            manifests[name] = data
+            h.update(data)
+        else:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        found[name] = h.hexdigest()
+    return found, manifests
+
+def stream_tar_members(
+    bundle_path: Path,
+    algo: Optional[str] = None
+) -> Tuple[Dict[str, str], Dict[str, bytes], str, str]:
+    """
+    Runs hash_tar_members over a .tar.gz in one read of the file.
+    
+    Without `algo`, the hasher comes from the bundle's global PAX header
+    (read by tarfile before the first member); sha256 if it has none.
+    Returns hash_tar_members' results, the SHA256 of the .tar.gz itself and
+    the algorithm used.
+    """
+    with open(bundle_path, "rb") as raw:
+        gz = GunzipHashingReader(raw)
+        with tarfile.open(fileobj=gz, mode="r|") as tar:
+            if algo is None:
+                algo = tar.pax_headers.get(PAX_MANIFEST_HASH)
+                if algo not in MANIFEST_FILES:
+                    algo = "sha256"
+            found, manifests = hash_tar_members(tar, algo)
+        return found, manifests, gz.hexdigest(), algo
 
+def verify_manifest_streaming(bundle_path: Path) -> str:
+    """
+    Verifies a bundle's manifest straight from the .tar.gz, without
+    extracting anything to disk. Strict: nothing unexpected, nothing
+    missing, every hash matches.
+    Returns the SHA256 of the bundle file.
+    
+    Members are hashed while streaming, with the algorithm named by the
+    bundle's PAX header. The manifest filename is authoritative: if it
+    disagrees (e.g. older bundles without the header, hashed as sha256),
+    a second pass rehashes with the right algorithm.
+    """
+    found, manifests, bundle_sha, algo = stream_tar_members(bundle_path)
+    
+    # The manifest's filename names its hash algorithm
+    manifest_rel = next((m for m in MANIFEST_MEMBERS if m in manifests), None)
+    if manifest_rel is None:
+        raise ValueError("Manifest file missing from bundle.")
+    if MANIFEST_MEMBERS[manifest_rel] != algo:
+        algo = MANIFEST_MEMBERS[manifest_rel]
+        found, manifests, bundle_sha, algo = stream_tar_members(bundle_path, algo)
+    
+    expected = parse_manifest(manifests[manifest_rel])
+    # Ignore manifest file itself for hash check
+    found.pop(manifest_rel, None)
+    
+    # Strict mode: nothing unexpected, nothing missing, every hash matches
+    unexpected = found.keys() - expected.keys()
+    if unexpected:
+        raise ValueError(f"Unexpected file in bundle: {short_path(min(unexpected))}")
+    missing = expected.keys() - found.keys()
+    if missing:
+        raise ValueError(f"Missing file declared in manifest: {short_path(min(missing))}")
+    for rel_str, curr in found.items():
+        if curr != expected[rel_str]:
+            raise ValueError(f"Hash mismatch for {short_path(rel_str)}: expected {expected[rel_str]}, got {curr}")
+    
     logging.info(f"Manifest verified: {len(expected)} files ok.")
-    return True
+    return bundle_sha
+
+def new_verify_result(bundle_path: Path) -> Dict[str, Any]:
+    """The verify result shape, with nothing verified yet."""
+    return {
+        "bundle_path": str(bundle_path),
+        "bundle_sha256": None,
+        "signature_verified": None,
+        "manifest_verified": False,
+        "strict": True,
+        "error": None
+    }
 
 def verify_bundle(
     bundle_path: Path,
     sig_path: Optional[Path],
     cert_path: Optional[Path],
     identity: Optional[str],
-    issuer: Optional[str]
+    issuer: Optional[str],
+    cache_signatures: bool = False
 ) -> Dict[str, Any]:
+    """
+    Verifies a bundle's signature (if sig/cert are given) and its manifest.
     
-    result = {
-        "bundle_path": str(bundle_path),
-        "signature_verified": None,
-        "manifest_verified": False,
-        "strict": True,
-        "error": None
-    }
+    cache_signatures: reuse/record successful cosign results in-process; for
+    callers that verify the same bundle more than once (see verify_cosign).
+    """
+    result = new_verify_result(bundle_path)
 
     if not bundle_path.exists():
         # Let's return error dict instead of fail() so CLI can handle format
@@ -134,37 +320,71 @@ def verify_bundle(
         result["error"] = f"Bundle not found: {bundle_path}"
         return result
 
-    # Sig verify
-    if sig_path and cert_path:
-        try:
-            verify_cosign(bundle_path, sig_path, cert_path, identity, issuer)
-            result["signature_verified"] = True
-        except RuntimeError as e:
-             # verify_cosign raises RuntimeError on failure
-             result["signature_verified"] = False
-             result["error"] = str(e)
-             return result
-             
-    elif sig_path or cert_path:
+    if bool(sig_path) != bool(cert_path):
         result["error"] = "Both --sig and --cert must be provided for verification."
         return result
+    
+    # Sig verify runs in a worker thread (mostly waiting on the cosign
+    # subprocess) while the manifest is verified here; both only read the bundle.
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        sig_future = ex.submit(verify_cosign, bundle_path, sig_path, cert_path, identity, issuer, cache_signatures) if sig_path else None
         
-    # Extract
-    with tempfile.TemporaryDirectory() as tmp:
-        td = Path(tmp)
+        # Stream-verify: hash members straight from the archive (no extraction).
+        # Manifest problems raise ValueError; anything else means the archive
+        # itself is unsafe or unreadable.
+        manifest_error = None
         try:
-            with tarfile.open(bundle_path, "r:gz") as tar:
-                safe_extract(tar, td)
-        except Exception as e:
-            result["error"] = f"Failed to extract bundle: {e}"
-            return result
-            
-        try:
-            verify_manifest(td)
-            result["manifest_verified"] = True
+            result["bundle_sha256"] = verify_manifest_streaming(bundle_path)
         except ValueError as e:
-            result["manifest_verified"] = False
-            result["error"] = str(e)
-            return result
+            manifest_error = str(e)
+        except Exception as e:
+            manifest_error = f"Failed to extract bundle: {e}"
+        
+        # A signature failure takes precedence (fail closed)
+        if sig_future is not None:
+            try:
+                sig_future.result()
+                result["signature_verified"] = True
+            except RuntimeError as e:
+                 # verify_cosign raises RuntimeError on failure
+                 result["signature_verified"] = False
+                 result["error"] = str(e)
+                 return result
+    
+    if manifest_error:
+        result["error"] = manifest_error
+        return result
+    result["manifest_verified"] = True
 
     return result
+
+def verify_bundle_batch(bundles: List[Dict[str, Any]], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Verifies many bundles concurrently; results are returned in input order.
+    
+    Each spec is a dict of verify_bundle keyword arguments; only "bundle_path"
+    is required. The work is subprocess (cosign) and hashlib bound, both of
+    which release the GIL, so threads are enough. A failure in one bundle is
+    reported in its own result and does not abort the others.
+    """
+    def run(spec: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return verify_bundle(
+                Path(spec["bundle_path"]),
+                spec.get("sig_path"),
+                spec.get("cert_path"),
+                spec.get("identity"),
+                spec.get("issuer"),
+                spec.get("cache_signatures", False)
+            )
+        except Exception as e:
+            result = new_verify_result(spec.get("bundle_path", ""))
+            result["error"] = f"Runtime Error: {e}"
+            return result
+    
+    if len(bundles) < 2:
+        return [run(spec) for spec in bundles]
+    # None keeps ThreadPoolExecutor's default (cpu_count + 4, capped at 32):
+    # workers mostly wait on cosign, so even one CPU runs bundles concurrently.
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(run, bundles))
@@ -79,3 +79,29 @@ def test_verify_error_json(tmp_path):
         raise
     assert "error" in data
     assert "Bundle not found" in data["error"]
+
+def test_fast_path_verify_quiet(tmp_path, monkeypatch, capsys):
+    # main() handles plain pack/verify with argparse, without Typer
+    import sys
+    import pytest
+    from ci_evidence_pack.cli import main
+    
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "f.txt").write_text("content")
+    
+    monkeypatch.setattr(sys, "argv", [
+        "ci-evidence-pack", "pack", "--repo", str(repo), "--out", str(tmp_path / "dist"),
+        "--include", "f.txt", "--sbom", "none", "--no-collect-git", "--quiet"
+    ])
+    with pytest.raises(SystemExit) as exc:
+        main()
+    assert exc.value.code == 0
+    bundle = capsys.readouterr().out.strip()
+    assert bundle.endswith(".tar.gz")
+    
+    monkeypatch.setattr(sys, "argv", ["ci-evidence-pack", "verify", bundle, "-q"])
+    with pytest.raises(SystemExit) as exc:
+        main()
+    assert exc.value.code == 0
+    assert capsys.readouterr().out.strip() == "OK"
@@ -218,3 +218,394 @@ def test_verify_symlink_fail(tmp_path):
     vres = verify_bundle(bad_bundle, None, None, None, None)
     assert vres["error"] is not None
     assert "Failed to extract bundle" in vres["error"] or "Unsafe symlink" in vres["error"]
+
+@pytest.mark.parametrize("name,reason", [
+    ("C:/x", "Unsafe absolute path"),
+    ("\\srv\\x", "Unsafe absolute path"),
+    ("a\\..\\b", "Unsafe path traversal"),
+])
+def test_verify_windows_style_paths_fail(tmp_path, monkeypatch, name, reason):
+    """Drive letters, backslash roots and backslash traversal are rejected."""
+    import io
+    import gzip
+    bundle = tmp_path / "bad.tar.gz"
+    with open(bundle, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        with tarfile.open(fileobj=gz, mode="w|") as tar:
+            ti = tarfile.TarInfo(name)
+            ti.size = 1
+            tar.addfile(ti, io.BytesIO(b"x"))
+    
+    vres = verify_bundle(bundle, None, None, None, None)
+    assert not vres["manifest_verified"]
+    assert vres["error"] == f"Failed to extract bundle: {reason}: {name}"
+    
+    # Both the PEP 706 filter path and the per-member fallback
+    for _ in range(2):
+        dest = tmp_path / "dest"
+        with tarfile.open(bundle, "r:gz") as tar:
+            with pytest.raises(Exception, match=reason):
+                safe_extract(tar, dest)
+        assert not dest.exists() or not any(dest.rglob("*"))
+        if not hasattr(tarfile, "data_filter"):
+            break
+        monkeypatch.delattr(tarfile, "data_filter")
+
+def test_bundle_sha256_matches_file(tmp_path):
+    """The inline-hashed bundle digest must match the bytes on disk."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "big.bin").write_bytes(os.urandom(256 * 1024))
+    
+    res = create_bundle(
+        repo_root=repo,
+        output_dir=tmp_path / "out",
+        bundle_name="bundle.tar.gz",
+        includes=["big.bin"],
+        exclude_globs=[],
+        sbom_format="none",
+        collect_git=False,
+        collect_pip=False,
+        cosign_sign=False,
+        cosign_identity=None,
+        cosign_issuer=None
+    )
+    on_disk = hashlib.sha256(Path(res["bundle_path"]).read_bytes()).hexdigest()
+    assert res["bundle_sha256"] == on_disk
+    
+    # Verify reports the same digest from its single streaming read
+    vres = verify_bundle(Path(res["bundle_path"]), None, None, None, None)
+    assert vres["manifest_verified"] is True
+    assert vres["bundle_sha256"] == on_disk
+
+def test_verify_truncated_bundle(tmp_path):
+    """A cut-off .tar.gz fails verification instead of passing on a partial read."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "big.bin").write_bytes(os.urandom(256 * 1024))
+    
+    res = create_bundle(
+        repo_root=repo,
+        output_dir=tmp_path / "out",
+        bundle_name="bundle.tar.gz",
+        includes=["big.bin"],
+        exclude_globs=[],
+        sbom_format="none",
+        collect_git=False,
+        collect_pip=False,
+        cosign_sign=False,
+        cosign_identity=None,
+        cosign_issuer=None
+    )
+    bundle = Path(res["bundle_path"])
+    # Drop the gzip trailer (CRC32 + size)
+    bundle.write_bytes(bundle.read_bytes()[:-8])
+    
+    vres = verify_bundle(bundle, None, None, None, None)
+    assert vres["manifest_verified"] is False
+    assert "Failed to extract bundle" in vres["error"]
+
+def test_exclude_globs(tmp_path):
+    """Excluded names and globs are pruned from both the tar and the manifest."""
+    repo = tmp_path / "repo"
+    (repo / "build" / "__pycache__").mkdir(parents=True)
+    (repo / "build" / "keep.txt").write_text("keep")
+    (repo / "build" / "skip.pyc").write_text("skip")
+    (repo / "build" / "__pycache__" / "mod.pyc").write_text("skip")
+    (repo / "build" / ".DS_Store").write_text("skip")
+    
+    res = create_bundle(
+        repo_root=repo,
+        output_dir=tmp_path / "out",
+        bundle_name="bundle.tar.gz",
+        includes=["build"],
+        exclude_globs=["*.pyc", "*/__pycache__"],
+        sbom_format="none",
+        collect_git=False,
+        collect_pip=False,
+        cosign_sign=False,
+        cosign_identity=None,
+        cosign_issuer=None
+    )
+    bundle = Path(res["bundle_path"])
+    with tarfile.open(bundle, "r:gz") as tar:
+        names = tar.getnames()
+    assert "artifacts/build/keep.txt" in names
+    assert not any(n.endswith((".pyc", ".DS_Store")) or "__pycache__" in n for n in names)
+    
+    vres = verify_bundle(bundle, None, None, None, None)
+    assert vres["manifest_verified"] is True
+
+def test_blake3_manifest_roundtrip(tmp_path, monkeypatch):
+    """--manifest-hash blake3 writes blake3sum.txt and verify picks it up in one pass."""
+    pytest.importorskip("blake3")
+    from ci_evidence_pack import verify as verify_mod
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "data.txt").write_text("verifiable")
+    
+    res = create_bundle(
+        repo_root=repo,
+        output_dir=tmp_path / "out",
+        bundle_name="bundle.tar.gz",
+        includes=["data.txt"],
+        exclude_globs=[],
+        sbom_format="none",
+        collect_git=False,
+        collect_pip=False,
+        cosign_sign=False,
+        cosign_identity=None,
+        cosign_issuer=None,
+        manifest_hash="blake3"
+    )
+    bundle = Path(res["bundle_path"])
+    with tarfile.open(bundle, "r:gz") as tar:
+        names = tar.getnames()
+    assert "manifest/blake3sum.txt" in names
+    assert "manifest/sha256sum.txt" not in names
+    
+    passes = []
+    real_stream = verify_mod.stream_tar_members
+    def counting_stream(*args):
+        passes.append(args)
+        return real_stream(*args)
+    monkeypatch.setattr(verify_mod, "stream_tar_members", counting_stream)
+    
+    vres = verify_bundle(bundle, None, None, None, None)
+    assert vres["manifest_verified"] is True
+    assert len(passes) == 1  # algorithm read from the PAX header
+    
+    # Older bundles without the header: sha256 guess, then a second pass
+    old = tmp_path / "old.tar.gz"
+    with tarfile.open(bundle, "r:gz") as src, tarfile.open(old, "w:gz", format=tarfile.PAX_FORMAT) as dst:
+        assert src.pax_headers
+        for m in src.getmembers():
+            dst.addfile(m, src.extractfile(m))
+    passes.clear()
+    vres = verify_bundle(old, None, None, None, None)
+    assert vres["manifest_verified"] is True
+    assert len(passes) == 2
+
+def test_cosign_cache_only_positives(tmp_path, monkeypatch):
+    """A verified (bundle, sig, cert, policy) skips cosign; failures always re-run."""
+    from ci_evidence_pack import verify as verify_mod
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    calls = tmp_path / "calls"
+    fake = bindir / "cosign"
+    fake.write_text(
+        f'#!/bin/sh\necho x >> "{calls}"\n'
+        'exit "${FAKE_RC:-0}"\n'
+    )
+    fake.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    verify_mod.reset_cosign_cache()
+    
+    def ncalls():
+        return len(calls.read_text().splitlines()) if calls.exists() else 0
+    
+    bundle, sig, cert = (tmp_path / n for n in ("b.tar.gz", "b.sig", "b.crt"))
+    for p in (bundle, sig, cert):
+        p.write_bytes(p.name.encode())
+    
+    try:
+        # Off by default: every call runs cosign
+        verify_mod.verify_cosign(bundle, sig, cert, None, None)
+        verify_mod.verify_cosign(bundle, sig, cert, None, None)
+        assert ncalls() == 2
+        assert not verify_mod.cosign_verified
+        
+        monkeypatch.setenv("FAKE_RC", "1")
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="Signature INVALID"):
+                verify_mod.verify_cosign(bundle, sig, cert, None, None, cache=True)
+        assert ncalls() == 4
+        
+        monkeypatch.setenv("FAKE_RC", "0")
+        verify_mod.verify_cosign(bundle, sig, cert, None, None, cache=True)
+        verify_mod.verify_cosign(bundle, sig, cert, None, None, cache=True)
+        assert ncalls() == 5
+        
+        # Different bytes: not a cache hit
+        sig.write_bytes(b"other")
+        verify_mod.verify_cosign(bundle, sig, cert, None, None, cache=True)
+        assert ncalls() == 6
+        
+        # The binary is resolved once
+        assert verify_mod.cosign_path() == str(fake)
+    finally:
+        # Drop the fake for later tests
+        verify_mod.reset_cosign_cache()
+
+def test_verify_bundle_batch(tmp_path):
+    """Batch results come back in input order, each with its own outcome."""
+    from ci_evidence_pack.verify import verify_bundle_batch
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    create_random_files(repo)
+    
+    paths = []
+    for i in range(3):
+        res = create_bundle(
+            repo_root=repo,
+            output_dir=tmp_path / f"out{i}",
+            bundle_name="bundle.tar.gz",
+            includes=["file1.txt"],
+            exclude_globs=[],
+            sbom_format="none",
+            collect_git=False,
+            collect_pip=False,
+            cosign_sign=False,
+            cosign_identity=None,
+            cosign_issuer=None
+        )
+        paths.append(Path(res["bundle_path"]))
+    specs = [{"bundle_path": p} for p in paths]
+    specs.insert(1, {"bundle_path": tmp_path / "missing.tar.gz"})
+    
+    results = verify_bundle_batch(specs)
+    assert [r["bundle_path"] for r in results] == [str(s["bundle_path"]) for s in specs]
+    assert [r["manifest_verified"] for r in results] == [True, False, True, True]
+    assert "Bundle not found" in results[1]["error"]
+    # Same shape as verify_bundle, even when a worker raises
+    specs.append({"bundle_path": paths[0], "sig_path": tmp_path / "only.sig"})
+    specs.append({})
+    results = verify_bundle_batch(specs)
+    keys = set(results[0])
+    assert all(set(r) == keys for r in results)
+    assert "Runtime Error" in results[-1]["error"]
+
+def test_verify_bundle_signature_and_manifest(tmp_path, monkeypatch):
+    """Signature and manifest checks both run; a bad signature wins (fail closed)."""
+    from ci_evidence_pack import verify as verify_mod
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    fake = bindir / "cosign"
+    fake.write_text('#!/bin/sh\nexit "${FAKE_RC:-0}"\n')
+    fake.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    verify_mod.reset_cosign_cache()
+    
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    create_random_files(repo)
+    res = create_bundle(
+        repo_root=repo,
+        output_dir=tmp_path / "out",
+        bundle_name="bundle.tar.gz",
+        includes=["file1.txt"],
+        exclude_globs=[],
+        sbom_format="none",
+        collect_git=False,
+        collect_pip=False,
+        cosign_sign=False,
+        cosign_identity=None,
+        cosign_issuer=None
+    )
+    bundle = Path(res["bundle_path"])
+    sig, cert = tmp_path / "b.sig", tmp_path / "b.crt"
+    sig.write_bytes(b"sig")
+    cert.write_bytes(b"cert")
+    
+    try:
+        monkeypatch.setenv("FAKE_RC", "1")
+        vres = verify_bundle(bundle, sig, cert, None, None)
+        assert vres["signature_verified"] is False
+        assert vres["manifest_verified"] is False
+        assert "Signature INVALID" in vres["error"]
+        
+        monkeypatch.setenv("FAKE_RC", "0")
+        vres = verify_bundle(bundle, sig, cert, None, None)
+        assert vres["signature_verified"] is True
+        assert vres["manifest_verified"] is True
+        assert vres["error"] is None
+    finally:
+        verify_mod.reset_cosign_cache()
+
+def test_verify_high_ratio_payload_bounded_memory(tmp_path):
+    """A small .tar.gz that inflates hugely is verified in bounded memory."""
+    import gzip
+    import io
+    import tracemalloc
+    from ci_evidence_pack.verify import stream_tar_members
+    size = 64 << 20
+    bundle = tmp_path / "bomb.tar.gz"
+    with open(bundle, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        with tarfile.open(fileobj=gz, mode="w|") as tar:
+            ti = tarfile.TarInfo("files/zero")
+            ti.size = size
+            zeros = io.BytesIO(bytes(size))
+            tar.addfile(ti, zeros)
+            del zeros
+    assert bundle.stat().st_size < size // 100
+    
+    tracemalloc.start()
+    try:
+        found, _, _, _ = stream_tar_members(bundle, "sha256")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert found["files/zero"] == hashlib.sha256(bytes(size)).hexdigest()
+    assert peak < 16 << 20
+    
+    # Manifests are read whole: an oversized one is rejected before reading
+    from ci_evidence_pack.verify import MAX_MANIFEST_SIZE
+    size = MAX_MANIFEST_SIZE + 1
+    with open(bundle, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        with tarfile.open(fileobj=gz, mode="w|") as tar:
+            ti = tarfile.TarInfo("manifest/sha256sum.txt")
+            ti.size = size
+            zeros = io.BytesIO(bytes(size))
+            tar.addfile(ti, zeros)
+            del zeros
+    
+    tracemalloc.start()
+    try:
+        res = verify_bundle(bundle, None, None, None, None)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert not res["manifest_verified"]
+    assert "Manifest too large" in res["error"]
+    assert len(res["error"]) < 500
+    assert peak < 16 << 20
+
+def test_pack_skips_own_bundle_via_symlink(tmp_path, monkeypatch):
+    """The bundle is never packed into itself, even through a symlinked dir; failures leave no partial file."""
+    import ci_evidence_pack.pack as pack_mod
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    create_random_files(repo)
+    (repo / "dist").mkdir()
+    (repo / "link").symlink_to("dist")
+    
+    def run():
+        return create_bundle(
+            repo_root=repo,
+            output_dir=repo / "dist",
+            bundle_name="bundle.tar.gz",
+            includes=["."],
+            exclude_globs=[],
+            sbom_format="none",
+            collect_git=False,
+            collect_pip=False,
+            cosign_sign=False,
+            cosign_identity=None,
+            cosign_issuer=None
+        )
+    
+    for _ in range(2):
+        res = run()
+        vres = verify_bundle(Path(res["bundle_path"]), None, None, None, None)
+        assert vres["manifest_verified"] is True, vres["error"]
+    with tarfile.open(res["bundle_path"], "r:gz") as tar:
+        assert not [n for n in tar.getnames() if n.endswith("bundle.tar.gz")]
+    
+    # A pack that fails midway keeps the previous bundle and leaves no temp file
+    good = Path(res["bundle_path"]).read_bytes()
+    def boom(ti):
+        raise OSError("disk full")
+    monkeypatch.setattr(pack_mod, "normalize_tarinfo", boom)
+    with pytest.raises(OSError, match="disk full"):
+        run()
+    assert Path(res["bundle_path"]).read_bytes() == good
+    assert sorted(p.name for p in (repo / "dist").iterdir()) == ["bundle.tar.gz"]